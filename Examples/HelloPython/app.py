@@ -3,19 +3,24 @@
 Simple Hello World Python HTTP Server
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 import os
 import socket
 
-class HelloWorldHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            
-            html_content = """
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_json(obj, indent=False):
+    """Serialize obj to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode()
+
+# Static responses are encoded once at import instead of on every request
+HTML_CONTENT = """
             <!DOCTYPE html charset="utf-8">
             <html lang="en">
             <head>
@@ -47,31 +52,41 @@ class HelloWorldHandler(BaseHTTPRequestHandler):
                 </div>
             </body>
             </html>
-            """
-            self.wfile.write(html_content.encode())
+            """.encode()
+
+HELLO_RESPONSE = dumps_json({
+    "message": "Hello World!",
+    "status": "success",
+    "server": "Python HTTP Server"
+}, indent=True)
+
+HEALTH_RESPONSE = dumps_json({
+    "status": "healthy",
+    "message": "Server is running"
+})
+
+class HelloWorldHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/':
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Length', str(len(HTML_CONTENT)))
+            self.end_headers()
+            self.wfile.write(HTML_CONTENT)
             
         elif self.path == '/api/hello':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(HELLO_RESPONSE)))
             self.end_headers()
-            
-            response = {
-                "message": "Hello World!",
-                "status": "success",
-                "server": "Python HTTP Server"
-            }
-            self.wfile.write(json.dumps(response, indent=2).encode())
+            self.wfile.write(HELLO_RESPONSE)
             
         elif self.path == '/health':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(HEALTH_RESPONSE)))
             self.end_headers()
-            
-            health_response = {
-                "status": "healthy",
-                "message": "Server is running"
-            }
-            self.wfile.write(json.dumps(health_response).encode())
+            self.wfile.write(HEALTH_RESPONSE)
             
         else:
             self.send_response(404)
@@ -82,23 +97,27 @@ class HelloWorldHandler(BaseHTTPRequestHandler):
                 "error": "Not Found",
                 "message": f"Path {self.path} not found"
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_json(error_response))
 
     def do_POST(self):
         if self.path == '/api/echo':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
+            # Decode once and serialize once; invalid UTF-8 is replaced
+            # rather than failing the request
             response = {
                 "message": "Echo endpoint",
-                "received_data": post_data.decode('utf-8'),
+                "received_data": post_data.decode('utf-8', 'replace'),
                 "status": "success"
             }
-            self.wfile.write(json.dumps(response, indent=2).encode())
+            body = dumps_json(response, indent=True)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
         else:
             self.send_response(404)
             self.send_header('Content-type', 'application/json')
@@ -108,14 +127,14 @@ class HelloWorldHandler(BaseHTTPRequestHandler):
                 "error": "Not Found",
                 "message": f"POST endpoint {self.path} not found"
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_json(error_response))
 
     def log_message(self, format, *args):
         print(f"[{self.date_time_string()}] {format % args}", flush=True)
 
 def run_server(port=8000):
     server_address = ('0.0.0.0', port)
-    httpd = HTTPServer(server_address, HelloWorldHandler)
+    httpd = ThreadingHTTPServer(server_address, HelloWorldHandler)
     print(f"Starting server on {server_address[0]}:{server_address[1]}", flush=True)
     print(f"Visit http://localhost:{port} to see the Hello World page", flush=True)
     print(f"API endpoints available:", flush=True)
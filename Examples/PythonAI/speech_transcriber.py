@@ -6,127 +6,202 @@ Captures audio from USB microphone and transcribes it using OpenAI's Whisper mod
 
 import sys
 import os
+import math
 import time
 import numpy as np
 import sounddevice as sd
 import queue
 import threading
+import torch
 import whisper
 import warnings
 
 # Suppress FP16 warning on CPU
 warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
 
+def select_torch_device():
+    """Pick the torch device for Whisper, preferring a GPU when one is available"""
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+def configure_cpu_threads():
+    """
+    Size torch's thread pool to the CPUs this process may actually run on
+
+    os.cpu_count() ignores container CPU affinity. This changes process-wide
+    settings and must be called once, before any torch parallel work.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        num_threads = len(os.sched_getaffinity(0))
+    else:
+        num_threads = os.cpu_count()
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+
 class SpeechTranscriber:
-    def __init__(self, model_size="base", device_index=None):
+    def __init__(self, model_size="base", device_index=None, device=None):
         """
         Initialize the speech transcriber with Whisper model
 
         Args:
             model_size: Size of Whisper model ('tiny', 'base', 'small', 'medium', 'large')
             device_index: Index of the audio device to use (None for default)
+            device: Torch device to run Whisper on (None to pick automatically)
         """
-        print(f"Loading Whisper model '{model_size}'...")
-        self.model = whisper.load_model(model_size)
+        self.device = device or select_torch_device()
+        self.fp16 = self.device == "cuda"  # FP16 is only supported on CUDA
+
+        print(f"Loading Whisper model '{model_size}' on {self.device}...")
+        try:
+            self.model = whisper.load_model(model_size, device=self.device)
+        except Exception as e:
+            if self.device != "mps":
+                raise
+            # Whisper's sparse alignment_heads buffer can't move to MPS on many torch builds
+            print(f"Could not load model on mps ({e}), falling back to cpu")
+            self.device = "cpu"
+            self.fp16 = False
+            self.model = whisper.load_model(model_size, device=self.device)
         print(f"Model loaded successfully!")
 
-        self.audio_queue = queue.Queue()
+        self.transcribe_queue = queue.Queue()  # completed utterances awaiting Whisper
+        self._transcribing = False  # True while the worker is running Whisper
         self.device_index = device_index
         self.sample_rate = 16000  # Whisper expects 16kHz audio
         self.channels = 1
         self.blocksize = int(self.sample_rate * 0.1)  # 100ms blocks
         self.recording = False
-        self.audio_buffer = []
+        self.max_audio_duration = 30  # seconds of audio held before forcing a transcription
+        self._max_samples = self.sample_rate * self.max_audio_duration
+        self.audio_buffer = np.empty(self._max_samples, dtype=np.float32)
+        self._write_idx = 0
         self.silence_threshold = 0.01
         self.silence_duration = 1.5  # seconds of silence before processing
         self.min_audio_duration = 0.5  # minimum audio duration to process
+        self.status_interval = 0.25  # seconds between status line redraws
+        self.shutdown_timeout = 10  # seconds to wait for queued transcriptions on exit
+        self._status_enabled = sys.stdout.isatty()
+        self._last_status = 0.0
 
     def list_audio_devices(self):
         """List all available audio input devices"""
         print("\nAvailable audio input devices:")
         print("-" * 50)
         devices = sd.query_devices()
+        default_in = sd.default.device[0]
         for i, device in enumerate(devices):
             if device['max_input_channels'] > 0:
-                default_marker = " (DEFAULT)" if i == sd.default.device[0] else ""
+                default_marker = " (DEFAULT)" if i == default_in else ""
                 print(f"Device {i}: {device['name']}{default_marker}")
                 print(f"  Channels: {device['max_input_channels']}")
                 print(f"  Sample Rate: {device['default_samplerate']}")
         print("-" * 50)
 
-    def audio_callback(self, indata, frames, time_info, status):
-        """Callback for audio stream"""
-        if status:
-            print(f"Audio callback status: {status}", file=sys.stderr)
-
-        # Add audio to queue for processing
-        self.audio_queue.put(indata.copy())
-
-    def process_audio_queue(self):
-        """Process audio from the queue in a separate thread"""
+    def process_audio_stream(self, stream):
+        """Read audio blocks from the input stream and detect speech"""
         silence_samples = 0
         silence_threshold_samples = int(self.silence_duration * self.sample_rate)
 
         while self.recording:
-            try:
-                # Get audio chunk from queue
-                audio_chunk = self.audio_queue.get(timeout=0.1)
+            # Blocking read of the next audio chunk, device errors propagate to run()
+            audio_chunk, overflowed = stream.read(self.blocksize)
+            if overflowed:
+                print("\nAudio input overflowed, some samples were dropped", file=sys.stderr)
 
-                # Calculate RMS (volume level)
-                rms = np.sqrt(np.mean(audio_chunk**2))
+            try:
+                # Calculate RMS (volume level) without a squared temporary
+                flat = audio_chunk.reshape(-1)
+                rms = math.sqrt(float(np.dot(flat, flat)) / flat.size)
 
                 if rms > self.silence_threshold:
                     # Voice detected, add to buffer
-                    self.audio_buffer.append(audio_chunk)
+                    self.append_audio(audio_chunk)
                     silence_samples = 0
 
                     # Visual feedback
-                    bar_length = int(rms * 100)
-                    bar = '#' * min(bar_length, 50)
-                    print(f"\rRecording: [{bar:<50}] Volume: {rms:.4f}", end='', flush=True)
+                    if self.status_due():
+                        bar_length = int(rms * 100)
+                        bar = '#' * min(bar_length, 50)
+                        print(f"\rRecording: [{bar:<50}] Volume: {rms:.4f}", end='', flush=True)
 
                 else:
                     # Silence detected
-                    if len(self.audio_buffer) > 0:
-                        self.audio_buffer.append(audio_chunk)
+                    if self._write_idx > 0:
+                        self.append_audio(audio_chunk)
                         silence_samples += len(audio_chunk)
 
                         # Check if we have enough silence to process
                         if silence_samples >= silence_threshold_samples:
                             self.process_buffer()
                             silence_samples = 0
-                    else:
+                    elif self.status_due():
                         print(f"\rListening... (speak into the microphone)", end='', flush=True)
 
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"\nError in audio processing: {e}", file=sys.stderr)
 
+    def status_due(self):
+        """Return True if the status line should be redrawn now"""
+        if not self._status_enabled:
+            return False
+        now = time.monotonic()
+        if now - self._last_status < self.status_interval:
+            return False
+        self._last_status = now
+        return True
+
+    def append_audio(self, audio_chunk):
+        """Copy a (frames, 1) audio chunk into the preallocated buffer"""
+        n = len(audio_chunk)
+        if self._write_idx + n > self._max_samples:
+            # Buffer full, hand off what we have before continuing
+            self.process_buffer()
+        self.audio_buffer[self._write_idx:self._write_idx + n] = audio_chunk[:, 0]
+        self._write_idx += n
+
     def process_buffer(self):
-        """Process the accumulated audio buffer with Whisper"""
-        if len(self.audio_buffer) == 0:
+        """Queue the accumulated audio buffer for transcription"""
+        if self._write_idx == 0:
             return
 
-        # Concatenate all audio chunks
-        audio_data = np.concatenate(self.audio_buffer, axis=0).flatten()
-
         # Check minimum duration
-        duration = len(audio_data) / self.sample_rate
-        if duration < self.min_audio_duration:
-            self.audio_buffer = []
-            return
+        duration = self._write_idx / self.sample_rate
+        if duration >= self.min_audio_duration:
+            # Copy out, the buffer is reused for the next utterance
+            self.transcribe_queue.put(self.audio_buffer[:self._write_idx].copy())
+
+        # Clear buffer for next recording
+        self._write_idx = 0
+
+    def transcribe_worker(self):
+        """Transcribe queued utterances until a None sentinel is received"""
+        while True:
+            audio_data = self.transcribe_queue.get()
+            if audio_data is None:
+                break
+            self._transcribing = True
+            try:
+                self.transcribe(audio_data)
+            finally:
+                self._transcribing = False
 
+    def transcribe(self, audio_data):
+        """Transcribe a single utterance with Whisper"""
+        duration = len(audio_data) / self.sample_rate
         print(f"\n\nProcessing {duration:.1f} seconds of audio...")
 
         try:
-            # Transcribe with Whisper
-            result = self.model.transcribe(
-                audio_data,
-                language=None,  # Auto-detect language
-                fp16=False,  # Use FP32 for CPU
-                verbose=False
-            )
+            # Transcribe with Whisper, no autograd bookkeeping is needed
+            with torch.inference_mode():
+                result = self.model.transcribe(
+                    audio_data,
+                    language=None,  # Auto-detect language
+                    fp16=self.fp16,  # FP16 on CUDA, FP32 otherwise
+                    verbose=False
+                )
 
             # Print results
             text = result['text'].strip()
@@ -140,11 +215,15 @@ class SpeechTranscriber:
         except Exception as e:
             print(f"\nError during transcription: {e}", file=sys.stderr)
 
-        # Clear buffer for next recording
-        self.audio_buffer = []
+    def warm_up(self):
+        """Run the model once so the first real transcription doesn't pay the startup cost"""
+        with torch.inference_mode():
+            self.model.transcribe(np.zeros(self.sample_rate, dtype=np.float32), fp16=self.fp16)
 
     def run(self):
         """Main loop for audio capture and transcription"""
+        self.warm_up()
+
         # List available devices
         self.list_audio_devices()
 
@@ -161,42 +240,53 @@ class SpeechTranscriber:
 
         self.recording = True
 
-        # Start audio processing thread
-        processing_thread = threading.Thread(target=self.process_audio_queue)
-        processing_thread.start()
+        # Start the transcription thread, so Whisper never blocks
+        # silence detection on incoming audio
+        transcription_thread = threading.Thread(target=self.transcribe_worker, daemon=True)
+        transcription_thread.start()
 
         try:
-            # Start audio stream
+            # Start audio stream and read from it on this thread
             with sd.InputStream(
                 device=self.device_index,
                 channels=self.channels,
                 samplerate=self.sample_rate,
                 blocksize=self.blocksize,
-                callback=self.audio_callback
-            ):
-                # Keep the stream running
-                while self.recording:
-                    time.sleep(0.1)
+                dtype='float32'
+            ) as stream:
+                self.process_audio_stream(stream)
 
         except KeyboardInterrupt:
             print("\n\nShutting down...")
         except Exception as e:
             print(f"\nError: {e}", file=sys.stderr)
         finally:
-            self.cleanup(processing_thread)
+            self.cleanup(transcription_thread)
 
-    def cleanup(self, processing_thread):
+    def cleanup(self, transcription_thread):
         """Clean up resources"""
         self.recording = False
 
         # Process any remaining audio
-        if len(self.audio_buffer) > 0:
+        if self._write_idx > 0:
             print("\nProcessing remaining audio...")
             self.process_buffer()
 
-        # Wait for processing thread to finish
-        if processing_thread and processing_thread.is_alive():
-            processing_thread.join(timeout=2)
+        # Give the transcription thread a bounded time to drain the queue,
+        # anything still pending after that is dropped
+        if transcription_thread and transcription_thread.is_alive():
+            # Count the utterance being transcribed right now as well
+            pending = self.transcribe_queue.qsize() + int(self._transcribing)
+            self.transcribe_queue.put(None)
+            if pending:
+                print(f"\nTranscribing {pending} pending utterance(s), "
+                      f"waiting up to {self.shutdown_timeout}s (Ctrl+C to skip)...")
+            try:
+                transcription_thread.join(timeout=self.shutdown_timeout)
+            except KeyboardInterrupt:
+                pass
+            if transcription_thread.is_alive():
+                print("\nDropping untranscribed audio.")
 
         print("\nSpeech transcriber stopped.")
 
@@ -218,10 +308,16 @@ def main():
 
     args = parser.parse_args()
 
+    # Configure torch threads before any torch work starts
+    device = select_torch_device()
+    if device == "cpu":
+        configure_cpu_threads()
+
     # Create transcriber
     transcriber = SpeechTranscriber(
         model_size=args.model,
-        device_index=args.device
+        device_index=args.device,
+        device=device
     )
 
     # List devices and exit if requested
@@ -7,8 +7,71 @@ Tests audio input devices and helps diagnose microphone issues
 import sounddevice as sd
 import numpy as np
 import sys
+import math
 import time
+import queue
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit
+
+try:
+    import scipy.signal as scipy_signal
+except ImportError:
+    scipy_signal = None
+
+# Volume bars padded to full width, indexed by bar length
+BARS = [('#' * i).ljust(50) for i in range(51)]
+
+# Audio is captured as 16-bit PCM, this maps sample values to [-1.0, 1.0)
+SCALE = 1.0 / 32768.0
+
+# Extra time allowed beyond the test duration for the device to deliver all samples
+STREAM_TIMEOUT_NS = 2_000_000_000
+
+# Frequency range searched for the dominant frequency of a voice
+VOICE_MIN_HZ = 85
+VOICE_MAX_HZ = 3000
+
+# Level labels indexed by how many of the 0.001 / 0.01 / 0.1 thresholds are exceeded
+LEVELS = ("NONE", "LOW ", "GOOD", "HIGH")
+
+@njit(cache=True, fastmath=True)
+def _block_stats(x):
+    """RMS and peak absolute level of an int16 audio block in one compiled pass
+
+    Both values are scaled to full scale (1.0).
+    """
+    s = 0.0
+    peak = 0.0
+    for v in x.ravel():
+        f = float(v)
+        s += f * f
+        if abs(f) > peak:
+            peak = abs(f)
+    return math.sqrt(s / x.size) * SCALE, peak * SCALE
+
+def _compile_block_stats():
+    """Compile _block_stats before the audio stream needs it
+
+    Numba specializes on array dimensions, so this covers both the writable
+    (frames, 1) blocks sounddevice hands to callbacks and 1-D slices of a
+    recording buffer.
+    """
+    _block_stats(np.zeros((1, 1), dtype=np.int16))
+    _block_stats(np.zeros(1, dtype=np.int16))
+
+def _power_spectrum(signal, sample_rate):
+    """Power spectrum of signal and the frequency of each bin
+
+    Uses Welch's method (averaged Hann-windowed periodograms of up to 4096
+    samples) when SciPy is available, falling back to a single real FFT of
+    the whole signal.
+    """
+    if scipy_signal is not None:
+        return scipy_signal.welch(signal, fs=sample_rate, nperseg=min(4096, signal.size))
+    spectrum = np.fft.rfft(signal)
+    power = spectrum.real * spectrum.real + spectrum.imag * spectrum.imag
+    return np.fft.rfftfreq(signal.size, 1/sample_rate), power
 
 def list_audio_devices():
     """List all available audio devices"""
@@ -17,17 +80,17 @@ def list_audio_devices():
     print("="*60)
 
     devices = sd.query_devices()
-    input_devices = []
-
-    for i, device in enumerate(devices):
-        if device['max_input_channels'] > 0:
-            input_devices.append(i)
-            default_marker = " [DEFAULT]" if i == sd.default.device[0] else ""
-            print(f"\nDevice #{i}{default_marker}:")
-            print(f"  Name: {device['name']}")
-            print(f"  Channels: {device['max_input_channels']}")
-            print(f"  Sample Rate: {device['default_samplerate']} Hz")
-            print(f"  Host API: {device['hostapi']}")
+    default_in = sd.default.device[0]
+    input_devices = [i for i, device in enumerate(devices) if device['max_input_channels'] > 0]
+
+    for i in input_devices:
+        device = devices[i]
+        default_marker = " [DEFAULT]" if i == default_in else ""
+        print(f"\nDevice #{i}{default_marker}:")
+        print(f"  Name: {device['name']}")
+        print(f"  Channels: {device['max_input_channels']}")
+        print(f"  Sample Rate: {device['default_samplerate']} Hz")
+        print(f"  Host API: {device['hostapi']}")
 
     if not input_devices:
         print("\n*** NO INPUT DEVICES FOUND ***")
@@ -56,33 +119,63 @@ def test_audio_input(device_index=None, duration=5, sample_rate=16000):
     print("-"*60)
 
     try:
-        # Record audio
-        recording = sd.rec(
-            int(duration * sample_rate),
-            samplerate=sample_rate,
-            channels=1,
-            device=device_index,
-            dtype='float32'
-        )
-
-        # Display volume levels in real-time
-        start_time = time.time()
-        max_volume = 0
+        # The stream callback only copies samples into a preallocated buffer
+        # and queues the (start, count) of each block, the volume statistics
+        # and display run here on the main thread
+        total_samples = int(duration * sample_rate)
+        recording = np.empty(total_samples, dtype='int16')  # mono, so kept 1-D
+        write_idx = 0
+        blocks = queue.SimpleQueue()
+        max_volume = 0.0
         min_volume = 1.0
+        peak_level = 0.0
         samples_detected = 0
+        _compile_block_stats()
+        write = sys.stdout.write
+        flush = sys.stdout.flush
 
-        while time.time() - start_time < duration:
-            # Wait for a small chunk to be recorded
-            time.sleep(0.1)
-            elapsed = time.time() - start_time
-            samples_available = int(elapsed * sample_rate)
+        def audio_callback(indata, frames, time_info, status):
+            nonlocal write_idx
+            if status:
+                print(f"Status: {status}")
+            if write_idx >= total_samples:
+                raise sd.CallbackStop
 
-            if samples_available > 0:
-                # Calculate RMS of recorded samples so far
-                chunk = recording[:samples_available]
-                rms = np.sqrt(np.mean(chunk**2))
+            n = min(frames, total_samples - write_idx)
+            recording[write_idx:write_idx + n] = indata[:n, 0]
+            blocks.put((write_idx, n))
+            write_idx += n
+
+            if write_idx >= total_samples:
+                raise sd.CallbackStop
+
+        with sd.InputStream(
+            samplerate=sample_rate,
+            channels=1,
+            device=device_index,
+            dtype='int16',
+            blocksize=int(sample_rate * 0.1),
+            callback=audio_callback
+        ):
+            # Drain blocks until the buffer is full, waking up regularly so
+            # Ctrl+C is handled and a stalled device doesn't hang the test
+            deadline_ns = time.monotonic_ns() + int(duration * 1_000_000_000) + STREAM_TIMEOUT_NS
+            received = 0
+            while received < total_samples:
+                try:
+                    start, n = blocks.get(timeout=0.1)
+                except queue.Empty:
+                    if time.monotonic_ns() >= deadline_ns:
+                        raise RuntimeError("audio device stopped delivering samples")
+                    continue
+                received = start + n
+
+                # Measure the volume of the new block
+                rms, peak = _block_stats(recording[start:received])
 
                 # Update statistics
+                if peak > peak_level:
+                    peak_level = peak
                 if rms > max_volume:
                     max_volume = rms
                 if rms < min_volume and rms > 0:
@@ -92,15 +185,19 @@ def test_audio_input(device_index=None, duration=5, sample_rate=16000):
 
                 # Create visual bar
                 bar_length = int(rms * 100)
-                bar = '#' * min(bar_length, 50)
+                bar = BARS[min(bar_length, 50)]
 
                 # Display
+                elapsed = received / sample_rate
                 remaining = duration - elapsed
-                print(f"\r[{elapsed:4.1f}s] Volume: [{bar:<50}] {rms:.4f} | Remaining: {remaining:3.1f}s",
-                      end='', flush=True)
+                write(f"\r[{elapsed:4.1f}s] Volume: [{bar}] {rms:.4f} | Remaining: {remaining:3.1f}s")
+                flush()
 
-        # Wait for recording to complete
-        sd.wait()
+        # Start the frequency analysis in the background while the results are
+        # printed, NumPy/SciPy release the GIL while transforming
+        executor = ThreadPoolExecutor(max_workers=1)
+        spectrum_future = executor.submit(_power_spectrum, recording, sample_rate)
+        executor.shutdown(wait=False)
 
         # Analyze results
         print(f"\n" + "-"*60)
@@ -108,9 +205,10 @@ def test_audio_input(device_index=None, duration=5, sample_rate=16000):
         print(f"  Recording completed: YES")
         print(f"  Max volume detected: {max_volume:.4f}")
         print(f"  Min volume detected: {min_volume:.4f}")
+        print(f"  Peak level detected: {peak_level:.4f}")
 
         # Check if audio was detected
-        overall_rms = np.sqrt(np.mean(recording**2))
+        overall_rms, _ = _block_stats(recording)
         if overall_rms < 0.001:
             print("\n*** WARNING: No audio detected! ***")
             print("Possible issues:")
@@ -129,21 +227,27 @@ def test_audio_input(device_index=None, duration=5, sample_rate=16000):
             print(f"  Average volume: {overall_rms:.4f}")
 
             # Frequency analysis
-            fft = np.fft.fft(recording.flatten())
-            freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-            magnitude = np.abs(fft)
-
-            # Find dominant frequency
-            positive_freqs = freqs[:len(freqs)//2]
-            positive_magnitude = magnitude[:len(magnitude)//2]
-            dominant_freq_idx = np.argmax(positive_magnitude[1:]) + 1  # Skip DC component
-            dominant_freq = positive_freqs[dominant_freq_idx]
-
-            print(f"  Dominant frequency: {dominant_freq:.1f} Hz")
-
-            # Estimate if it's voice
-            if 85 <= dominant_freq <= 3000:
-                print("  Frequency range suggests human voice detected")
+            freqs, power = spectrum_future.result()
+
+            # Find dominant frequency, only searching the voice band (this also skips DC)
+            lo = int(np.searchsorted(freqs, VOICE_MIN_HZ))
+            hi = int(np.searchsorted(freqs, VOICE_MAX_HZ, side='right'))
+            total_power = float(power[1:].sum())
+            if lo < hi and total_power > 0:
+                band_power = power[lo:hi]
+                peak_idx = int(np.argmax(band_power))
+
+                # A peak on the first or last bin of the band means the
+                # spectrum is still rising there, so the true peak lies outside
+                if 0 < peak_idx < len(band_power) - 1:
+                    dominant_freq = float(freqs[lo + peak_idx])
+                    print(f"  Dominant frequency ({VOICE_MIN_HZ}-{VOICE_MAX_HZ} Hz): {dominant_freq:.1f} Hz")
+                else:
+                    print(f"  Dominant frequency is outside the voice band ({VOICE_MIN_HZ}-{VOICE_MAX_HZ} Hz)")
+
+                # Estimate if it's voice, most of the signal's energy should be in the band
+                if float(band_power.sum()) > 0.5 * total_power:
+                    print("  Frequency range suggests human voice detected")
 
         return True
 
@@ -172,30 +276,30 @@ def continuous_monitor(device_index=None, sample_rate=16000):
     print("Press Ctrl+C to stop")
     print("-"*60)
 
+    write = sys.stdout.write
+    flush = sys.stdout.flush
+
     def audio_callback(indata, frames, time_info, status):
         if status:
             print(f"Status: {status}")
 
-        rms = np.sqrt(np.mean(indata**2))
+        rms, _ = _block_stats(indata)
         bar_length = int(rms * 100)
-        bar = '#' * min(bar_length, 50)
+        bar = BARS[min(bar_length, 50)]
 
         # Color coding for terminal (if supported)
-        if rms > 0.1:
-            level = "HIGH"
-        elif rms > 0.01:
-            level = "GOOD"
-        elif rms > 0.001:
-            level = "LOW "
-        else:
-            level = "NONE"
+        level = LEVELS[(rms > 0.001) + (rms > 0.01) + (rms > 0.1)]
+
+        write(f"\r[{level}] [{bar}] {rms:.4f}")
+        flush()
 
-        print(f"\r[{level}] [{bar:<50}] {rms:.4f}", end='', flush=True)
+    _compile_block_stats()
 
     try:
         with sd.InputStream(
             callback=audio_callback,
             channels=1,
+            dtype='int16',
             samplerate=sample_rate,
             device=device_index
         ):